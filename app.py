@@ -1,14 +1,15 @@
 import os
 import io
-import json
+import gzip
 import datetime as dt
 from typing import List, Dict, Any, Optional
 
+import orjson
 import streamlit as st
 
-from backend.job_sources import search_jobs_with_perplexity
-from backend.resume_tailor import generate_tailored_resume_and_email
-from backend.apply_bot import build_application_payload
+from backend.job_sources import stream_jobs_with_perplexity
+from backend.apply_bot import build_application_payload, build_application_payloads
+from backend.utils import dedupe_jobs
 
 st.set_page_config(
     page_title="AutoApply AI",
@@ -19,18 +20,47 @@ st.set_page_config(
 
 # ------------ Helper state ---------------
 
+# Applications shown per page in the Application Queue tab.
+QUEUE_PAGE_SIZE = 10
+
+
 def init_state():
     defaults = {
         "jobs": [],
         "applications": [],
         "profile": {},
         "last_scan": None,
+        # Bumped on every change to "applications"; keys the download cache.
+        "apps_version": 0,
+        "apps_json": None,
+        # Selected page of the Application Queue tab.
+        "queue_page": 1,
     }
     for k, v in defaults.items():
         if k not in st.session_state:
             st.session_state[k] = v
 
 
+def queue_applications(payloads: List[Dict[str, Any]]):
+    st.session_state["applications"].extend(payloads)
+    st.session_state["apps_version"] += 1
+
+
+def apps_json_gz() -> bytes:
+    """
+    Compact, gzipped JSON of the application queue, built once per change
+    instead of on every rerun. Memoized in session_state (not st.cache_data)
+    so queues of different users never share an entry.
+    """
+    version = st.session_state["apps_version"]
+    cached = st.session_state["apps_json"]
+    if cached is None or cached[0] != version:
+        body = orjson.dumps(st.session_state["applications"])
+        cached = (version, gzip.compress(body, compresslevel=5))
+        st.session_state["apps_json"] = cached
+    return cached[1]
+
+
 init_state()
 
 # ------------ Sidebar --------------------
@@ -114,6 +144,64 @@ with st.sidebar:
         }
         st.success("Profile saved in session.")
 
+# ------------ Job card -------------------
+
+def render_job_card(idx: int, job: Dict[str, Any], uploaded_cv):
+    """
+    One job in the feed, with its Tailor button.
+    """
+    with st.container(border=True):
+        top_cols = st.columns([4, 2])
+        with top_cols[0]:
+            st.markdown(f"#### {job.get('title', 'Unknown Title')}")
+            st.markdown(
+                f"**Company:** {job.get('company', 'Unknown')}  "
+                f"• **Location:** {job.get('location', 'N/A')}  "
+                f"• **Type:** {job.get('type', 'N/A')}"
+            )
+        with top_cols[1]:
+            posted_at = job.get("posted_at", "")
+            st.markdown(f"**Posted:** {posted_at or 'Unknown'}")
+            st.markdown(f"**Source:** {job.get('source', 'web')}")
+
+        st.write(job.get("summary", ""))
+
+        link = job.get("url")
+        if link:
+            st.markdown(f"[🔗 Open original job post]({link})")
+
+        col_a, col_b = st.columns([1, 1])
+        with col_a:
+            if st.button(
+                "✨ Tailor resume & email just for this job",
+                key=f"tailor_{idx}",
+            ):
+                if uploaded_cv is None:
+                    st.error(
+                        "Please upload your base resume in the sidebar first."
+                    )
+                else:
+                    with st.spinner(
+                        "Calling OpenAI to tailor resume & email..."
+                    ):
+                        try:
+                            app_payload = build_application_payload(
+                                job=job,
+                                uploaded_cv=uploaded_cv,
+                                profile=st.session_state["profile"],
+                            )
+                            queue_applications([app_payload])
+                            st.success(
+                                "Application payload added to queue "
+                                "(see 'Application Queue' tab)."
+                            )
+                        except Exception as e:
+                            st.error(
+                                f"Failed to build application payload: {e}"
+                            )
+        with col_b:
+            st.caption("Final submission is manual in this demo build.")
+
 # ------------ Main UI --------------------
 
 st.title("💼 AutoApply AI – Job Search Copilot")
@@ -168,9 +256,15 @@ with tab_feed:
         if not os.getenv("PERPLEXITY_API_KEY"):
             st.error("Please provide a Perplexity API key in the sidebar.")
         else:
-            with st.spinner("Contacting Perplexity & searching the web for jobs..."):
-                try:
-                    jobs = search_jobs_with_perplexity(
+            try:
+                with st.status(
+                    "Contacting Perplexity & searching the web for jobs...",
+                    expanded=True,
+                ) as scan_status:
+                    # Jobs are listed here as they stream in from Perplexity
+                    jobs = []
+                    raw_chunks = []
+                    for job in stream_jobs_with_perplexity(
                         target_titles=st.session_state["profile"].get("target_titles", ""),
                         locations=st.session_state["profile"].get("locations", ""),
                         must_have_keywords=st.session_state["profile"].get("must_have_keywords", ""),
@@ -178,39 +272,63 @@ with tab_feed:
                         max_age_hours=max_job_age_days * 24,  # days → hours
                         max_results=max_jobs,
                         extra_query=query_extra,
+                        raw_chunks=raw_chunks,
+                    ):
+                        jobs.append(job)
+                        st.write(
+                            f"{len(jobs)}. **{job.get('title', 'Unknown Title')}** "
+                            f"@ {job.get('company', 'Unknown')}"
+                        )
+                    scan_status.update(
+                        label=f"Received {len(jobs)} jobs from Perplexity.",
+                        state="complete",
+                        expanded=False,
                     )
 
-                    # Sort by posted_at descending (newest first)
-                    jobs_sorted = sorted(
-                        jobs,
-                        key=lambda j: j.get("posted_at", "") or "",
-                        reverse=True,
-                    )
-
-                    st.session_state["jobs"] = jobs_sorted
-                    st.session_state["last_scan"] = dt.datetime.now().isoformat()
-
-                    st.success(
-                        f"Found {len(jobs_sorted)} jobs (within ~{max_job_age_days} days)."
+                # Debug in UI so you can see what Perplexity is doing.
+                # Drawn after st.status: expanders can't nest in older Streamlit.
+                if raw_chunks:
+                    with st.expander("DEBUG: Raw Perplexity output", expanded=False):
+                        st.code("".join(raw_chunks))
+
+                # Sort by posted_at descending (newest first)
+                jobs_sorted = sorted(
+                    jobs,
+                    key=lambda j: j.get("posted_at", "") or "",
+                    reverse=True,
+                )
+                # Same posting on several aggregators -> tailor it only once
+                jobs_sorted = dedupe_jobs(jobs_sorted)
+
+                st.session_state["jobs"] = jobs_sorted
+                st.session_state["last_scan"] = dt.datetime.now().isoformat()
+
+                st.success(
+                    f"Found {len(jobs_sorted)} jobs (within ~{max_job_age_days} days)."
+                )
+
+                # Optionally auto-prepare applications
+                if auto_apply_toggle and uploaded_cv is not None:
+                    with st.spinner("Tailoring applications with OpenAI..."):
+                        app_payloads, tailor_errors = build_application_payloads(
+                            jobs=jobs_sorted,
+                            uploaded_cv=uploaded_cv,
+                            profile=st.session_state["profile"],
+                        )
+                    queue_applications(app_payloads)
+                    st.info(
+                        f"Prepared {len(app_payloads)} application payloads automatically."
                     )
-
-                    # Optionally auto-prepare applications
-                    if auto_apply_toggle and uploaded_cv is not None:
-                        auto_prep_count = 0
-                        for job in jobs_sorted:
-                            app_payload = build_application_payload(
-                                job=job,
-                                uploaded_cv=uploaded_cv,
-                                profile=st.session_state["profile"],
-                            )
-                            st.session_state["applications"].append(app_payload)
-                            auto_prep_count += 1
-                        st.info(
-                            f"Prepared {auto_prep_count} application payloads automatically."
+                    failed = len(jobs_sorted) - len(app_payloads)
+                    if failed:
+                        reason = tailor_errors[0] if tailor_errors else "OpenAI error"
+                        st.warning(
+                            f"Could not prepare {failed} applications ({reason}). "
+                            "Scan again or use **Tailor** on those jobs to retry."
                         )
 
-                except Exception as e:
-                    st.error(f"Error while searching jobs: {e}")
+            except Exception as e:
+                st.error(f"Error while searching jobs: {e}")
 
     st.markdown("### 📋 Job Feed (newest first)")
 
@@ -219,57 +337,7 @@ with tab_feed:
         st.info("No jobs yet. Click **Scan now** to fetch new postings.")
     else:
         for idx, job in enumerate(jobs):
-            with st.container(border=True):
-                top_cols = st.columns([4, 2])
-                with top_cols[0]:
-                    st.markdown(f"#### {job.get('title', 'Unknown Title')}")
-                    st.markdown(
-                        f"**Company:** {job.get('company', 'Unknown')}  "
-                        f"• **Location:** {job.get('location', 'N/A')}  "
-                        f"• **Type:** {job.get('type', 'N/A')}"
-                    )
-                with top_cols[1]:
-                    posted_at = job.get("posted_at", "")
-                    st.markdown(f"**Posted:** {posted_at or 'Unknown'}")
-                    st.markdown(f"**Source:** {job.get('source', 'web')}")
-
-                st.write(job.get("summary", ""))
-
-                link = job.get("url")
-                if link:
-                    st.markdown(f"[🔗 Open original job post]({link})")
-
-                col_a, col_b = st.columns([1, 1])
-                with col_a:
-                    if st.button(
-                        "✨ Tailor resume & email just for this job",
-                        key=f"tailor_{idx}",
-                    ):
-                        if uploaded_cv is None:
-                            st.error(
-                                "Please upload your base resume in the sidebar first."
-                            )
-                        else:
-                            with st.spinner(
-                                "Calling OpenAI to tailor resume & email..."
-                            ):
-                                try:
-                                    app_payload = build_application_payload(
-                                        job=job,
-                                        uploaded_cv=uploaded_cv,
-                                        profile=st.session_state["profile"],
-                                    )
-                                    st.session_state["applications"].append(app_payload)
-                                    st.success(
-                                        "Application payload added to queue "
-                                        "(see 'Application Queue' tab)."
-                                    )
-                                except Exception as e:
-                                    st.error(
-                                        f"Failed to build application payload: {e}"
-                                    )
-                with col_b:
-                    st.caption("Final submission is manual in this demo build.")
+            render_job_card(idx, job, uploaded_cv)
 
 # ----- APPLICATION QUEUE TAB -----
 
@@ -282,7 +350,20 @@ with tab_queue:
             "No application payloads yet. Use **Tailor resume & email** from the Job Feed."
         )
     else:
-        for idx, app in enumerate(apps):
+        # Only one page of expanders is rendered per rerun
+        num_pages = max(1, (len(apps) + QUEUE_PAGE_SIZE - 1) // QUEUE_PAGE_SIZE)
+        # Fixed label + key keep the selected page when the queue grows
+        st.session_state["queue_page"] = min(st.session_state["queue_page"], num_pages)
+        page = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=num_pages,
+            step=1,
+            key="queue_page",
+        )
+        st.caption(f"of {num_pages}")
+        first = (page - 1) * QUEUE_PAGE_SIZE
+        for idx, app in enumerate(apps[first : first + QUEUE_PAGE_SIZE], start=first):
             with st.expander(
                 f"{idx+1}. {app['job'].get('title', 'Unknown Title')} @ "
                 f"{app['job'].get('company', '')}"
@@ -296,10 +377,10 @@ with tab_queue:
 
         # Allow user to download all applications as JSON for later tooling
         st.markdown("---")
-        json_bytes = io.BytesIO(json.dumps(apps, indent=2).encode("utf-8"))
+        json_gz = io.BytesIO(apps_json_gz())
         st.download_button(
-            "⬇️ Download all applications as JSON",
-            data=json_bytes,
-            file_name="applications_payload.json",
-            mime="application/json",
+            "⬇️ Download all applications as JSON (gzip)",
+            data=json_gz,
+            file_name="applications_payload.json.gz",
+            mime="application/gzip",
         )
@@ -1,6 +1,35 @@
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, List, Tuple
 
-from .resume_tailor import generate_tailored_resume_and_email
+from .resume_tailor import (
+    TAILOR_BATCH_SIZE,
+    TAILOR_CACHE_SECONDS,
+    _get_async_client,
+    _read_cv_file,
+    _tailor_key,
+    generate_tailored_resume_and_email,
+    generate_tailored_batch_async,
+)
+from .utils import memo_get, memo_put, stable_hash
+
+# Max number of OpenAI tailoring calls in flight at the same time.
+MAX_CONCURRENT_TAILORS = 8
+
+
+def _make_payload(
+    job: Dict[str, Any],
+    tailored_resume_md: str,
+    email_body: str,
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "job": job,
+        "email_body": email_body,
+        "tailored_resume_md": tailored_resume_md,
+        # Hooks for further automation:
+        "target_email": None,  # you can populate this if you parse company emails
+        "source_system": job.get("source", "web"),
+    }
+    return payload
 
 
 def build_application_payload(
@@ -19,13 +48,67 @@ def build_application_payload(
         uploaded_cv=uploaded_cv,
         profile=profile,
     )
+    return _make_payload(job, tailored_resume_md, email_body)
 
-    payload: Dict[str, Any] = {
-        "job": job,
-        "email_body": email_body,
-        "tailored_resume_md": tailored_resume_md,
-        # Hooks for further automation:
-        "target_email": None,  # you can populate this if you parse company emails
-        "source_system": job.get("source", "web"),
-    }
-    return payload
+
+def build_application_payloads(
+    jobs: List[Dict[str, Any]],
+    uploaded_cv,
+    profile: Dict[str, Any],
+    concurrency: int = MAX_CONCURRENT_TAILORS,
+) -> Tuple[List[Dict[str, Any]], List[BaseException]]:
+    """
+    Bulk version of build_application_payload for auto-prep.
+    The CV is read once and jobs already tailored for this CV + profile come
+    from the disk cache. The rest are grouped into batches of
+    TAILOR_BATCH_SIZE (one OpenAI call each) and the batches run
+    concurrently, bounded by `concurrency`. Each job is cached as soon as its
+    batch finishes.
+
+    Returns (payloads, errors): payloads in the order of `jobs`, leaving out
+    jobs that failed (rate limit, timeout, ...), and the exceptions raised by
+    failed batches. If every batch failed, the first error is raised instead.
+    """
+    if not jobs:
+        return [], []
+
+    cv_text = _read_cv_file(uploaded_cv)
+    cv_hash, profile_hash = stable_hash(cv_text), stable_hash(profile)
+    keys = [_tailor_key(job, cv_hash, profile_hash) for job in jobs]
+    results = [memo_get("tailored", key, TAILOR_CACHE_SECONDS) for key in keys]
+
+    todo = [i for i, result in enumerate(results) if result is None]
+    batches = [
+        todo[i : i + TAILOR_BATCH_SIZE]
+        for i in range(0, len(todo), TAILOR_BATCH_SIZE)
+    ]
+
+    async def _tailor_batch(batch, client, sem):
+        batch_results = await generate_tailored_batch_async(
+            [jobs[i] for i in batch], cv_text, profile, client, sem
+        )
+        for i, result in zip(batch, batch_results):
+            if result is not None:
+                results[i] = result
+                memo_put("tailored", keys[i], result, TAILOR_CACHE_SECONDS)
+
+    async def _run_all():
+        sem = asyncio.Semaphore(concurrency)
+        async with _get_async_client() as client:
+            return await asyncio.gather(
+                *[_tailor_batch(batch, client, sem) for batch in batches],
+                return_exceptions=True,
+            )
+
+    errors: List[BaseException] = []
+    if batches:
+        errors = [e for e in asyncio.run(_run_all()) if isinstance(e, BaseException)]
+        if len(errors) == len(batches):
+            raise errors[0]
+
+    payloads = [
+        _make_payload(job, result[0], result[1])
+        for job, result in zip(jobs, results)
+        if result is not None
+    ]
+    return payloads, errors
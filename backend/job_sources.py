@@ -1,11 +1,32 @@
 import os
-import json
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 
-import requests
+import httpx
+import ijson
+import orjson
 import streamlit as st
 
+from .utils import memo_get, memo_put
+
+# Finished scans are reused for identical queries for this many seconds.
+SCAN_CACHE_SECONDS = 3600
+
+# Opening ```json fence (any case) around the model's JSON reply.
+_FENCE_JSON_RE = re.compile(r"```json", re.IGNORECASE)
+
+
+@st.cache_resource(show_spinner=False)
+def _pplx_client() -> httpx.Client:
+    """
+    Shared HTTP/2 client so repeated scans reuse the TLS connection.
+    """
+    return httpx.Client(
+        http2=True,
+        timeout=60.0,
+        headers={"Content-Type": "application/json"},
+    )
+
 
 def _build_search_prompt(
     target_titles: str,
@@ -57,33 +78,70 @@ Important – output format:
     """.strip()
 
 
+def _find_json_array(text: str) -> Optional[str]:
+    """
+    Return the first balanced [...] block in `text`, or None.
+    Single forward pass: tracks bracket depth and skips brackets that
+    appear inside JSON strings.
+    """
+    start = text.find("[")
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+
+    return None
+
+
 def _extract_json_list(text: str) -> List[Dict[str, Any]]:
     """
     Try hard to pull a JSON array out of the model output.
     If no JSON array is found or parsing fails, return an empty list.
     """
-    # Strip code fences if present
+    # Drop the reasoning block sonar-reasoning may put before the answer
+    if "</think>" in text:
+        text = text.rpartition("</think>")[2]
+
+    # Keep only the body of the first code fence, if present
     if "```" in text:
-        text = re.sub(r"```json", "", text, flags=re.IGNORECASE)
-        text = text.replace("```", "").strip()
+        parts = _FENCE_JSON_RE.split(text, maxsplit=1)
+        body = parts[1] if len(parts) > 1 else text.partition("```")[2]
+        text = body.partition("```")[0].strip()
 
     # First, try direct parse
     try:
-        obj = json.loads(text)
+        obj = orjson.loads(text)
         if isinstance(obj, list):
             return obj
     except Exception:
         pass
 
     # Fallback: grab the first [...] block
-    m = re.search(r"\[.*\]", text, re.DOTALL)
-    if not m:
+    arr_text = _find_json_array(text)
+    if arr_text is None:
         return []
 
-    arr_text = m.group(0)
-
     try:
-        obj = json.loads(arr_text)
+        obj = orjson.loads(arr_text)
     except Exception:
         return []
 
@@ -93,7 +151,42 @@ def _extract_json_list(text: str) -> List[Dict[str, Any]]:
     return obj
 
 
-def search_jobs_with_perplexity(
+def _json_array_start(text: str) -> Optional[int]:
+    """
+    Index of the '[' that opens the job list in a partial reply, or None if
+    it hasn't arrived yet. A leading <think> block is skipped as a whole.
+    """
+    head = text.lstrip()
+    offset = 0
+    if head.startswith("<think>") or "<think>".startswith(head):
+        end = text.find("</think>")
+        if end == -1:
+            return None
+        offset = end + len("</think>")
+
+    start = text.find("[", offset)
+    return None if start == -1 else start
+
+
+def _iter_sse_content(resp) -> Iterator[str]:
+    """
+    Yield the text deltas of a streamed chat-completions response.
+    """
+    for line in resp.iter_lines():
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            break
+        chunk = orjson.loads(data)
+        for choice in chunk.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+def _stream_jobs_uncached(
+    api_key: str,
     target_titles: str,
     locations: str,
     must_have_keywords: str,
@@ -101,21 +194,19 @@ def search_jobs_with_perplexity(
     max_age_hours: int,
     max_results: int,
     extra_query: str,
-) -> List[Dict[str, Any]]:
+    raw_chunks: Optional[List[str]] = None,
+) -> Iterator[Dict[str, Any]]:
     """
     Calls Perplexity's chat completions API to perform a web-grounded job search
-    and asks it to answer in structured JSON. If JSON can't be parsed, returns
-    an empty list instead of crashing.
+    and asks it to answer in structured JSON. The reply is streamed and each
+    job is yielded as soon as its object is complete, so the UI can show
+    results before the whole answer arrives. If the stream can't be parsed
+    incrementally, the full reply is parsed at the end instead; if that
+    fails too, nothing is yielded instead of crashing.
+    The raw reply text is appended to `raw_chunks` when one is passed.
     """
-    api_key = os.getenv("PERPLEXITY_API_KEY")
-    if not api_key:
-        raise RuntimeError("PERPLEXITY_API_KEY environment variable is not set.")
-
     url = "https://api.perplexity.ai/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+    headers = {"Authorization": f"Bearer {api_key}"}
 
     prompt = _build_search_prompt(
         target_titles=target_titles,
@@ -135,27 +226,145 @@ def search_jobs_with_perplexity(
         "max_tokens": 2048,
         "temperature": 0.2,
         "top_p": 0.9,
-        "stream": False,
+        "stream": True,
     }
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
-    resp.raise_for_status()
-    data = resp.json()
+    chunks = raw_chunks if raw_chunks is not None else []
+    pending = ""  # reply text seen before the job array starts
+    events = ijson.sendable_list()
+    parser = None
+    parse_failed = False
+    yielded = 0
 
-    raw_output = data["choices"][0]["message"]["content"]
+    with _pplx_client().stream("POST", url, headers=headers, json=payload) as resp:
+        resp.raise_for_status()
 
-    # Debug in UI so you can see what Perplexity is doing
-    with st.expander("DEBUG: Raw Perplexity output", expanded=False):
-        st.code(raw_output)
+        for content in _iter_sse_content(resp):
+            chunks.append(content)
+            if parse_failed:
+                continue
 
-    jobs = _extract_json_list(raw_output)
+            if parser is None:
+                pending += content
+                start = _json_array_start(pending)
+                if start is None:
+                    continue
+                parser = ijson.items_coro(events, "item", use_float=True)
+                content = pending[start:]
 
-    if not jobs:
-        return []
+            try:
+                parser.send(content.encode("utf-8"))
+            except ijson.JSONError:
+                # Trailing fences / prose after the array, or malformed JSON:
+                # finish with the full-text parser below.
+                parse_failed = True
+
+            for job in events:
+                if isinstance(job, dict):
+                    job["posted_at"] = job.get("posted_at") or ""
+                    yield job
+                    yielded += 1
+                    if yielded >= max_results:
+                        break
+            del events[:]
+
+            if yielded >= max_results:
+                break
+
+    if yielded >= max_results:
+        return
+
+    if parser is not None and not parse_failed:
+        try:
+            parser.close()
+            return
+        except ijson.JSONError:
+            pass
 
-    jobs = jobs[:max_results]
+    # Pick up whatever the incremental parser didn't manage to yield.
+    for job in _extract_json_list("".join(chunks))[yielded:max_results]:
+        if isinstance(job, dict):
+            job["posted_at"] = job.get("posted_at") or ""
+            yield job
 
-    for job in jobs:
-        job["posted_at"] = job.get("posted_at") or ""
 
-    return jobs
+def stream_jobs_with_perplexity(
+    target_titles: str,
+    locations: str,
+    must_have_keywords: str,
+    nice_to_have_keywords: str,
+    max_age_hours: int,
+    max_results: int,
+    extra_query: str,
+    raw_chunks: Optional[List[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields jobs for the given profile as they stream in from Perplexity.
+    Finished scans are persisted to disk and replayed for identical queries
+    for SCAN_CACHE_SECONDS, also across app restarts. The API
+    key is read from the environment and never becomes part of the cache key.
+    Pass a list as `raw_chunks` to collect the raw model reply for debugging
+    (it stays empty when the scan is served from the cache). No Streamlit
+    elements are drawn here, so callers can iterate inside st.status.
+    """
+    api_key = os.getenv("PERPLEXITY_API_KEY")
+    if not api_key:
+        raise RuntimeError("PERPLEXITY_API_KEY environment variable is not set.")
+
+    cache_key = (
+        target_titles,
+        locations,
+        must_have_keywords,
+        nice_to_have_keywords,
+        max_age_hours,
+        max_results,
+        extra_query,
+    )
+    cached = memo_get("perplexity_scan", cache_key, SCAN_CACHE_SECONDS)
+    if cached is not None:
+        yield from cached
+        return
+
+    found = []
+    for job in _stream_jobs_uncached(
+        api_key=api_key,
+        target_titles=target_titles,
+        locations=locations,
+        must_have_keywords=must_have_keywords,
+        nice_to_have_keywords=nice_to_have_keywords,
+        max_age_hours=max_age_hours,
+        max_results=max_results,
+        extra_query=extra_query,
+        raw_chunks=raw_chunks,
+    ):
+        found.append(job)
+        yield job
+
+    # Empty results are usually a parse failure; let the next scan retry.
+    if found:
+        memo_put("perplexity_scan", cache_key, found, SCAN_CACHE_SECONDS)
+
+
+def search_jobs_with_perplexity(
+    target_titles: str,
+    locations: str,
+    must_have_keywords: str,
+    nice_to_have_keywords: str,
+    max_age_hours: int,
+    max_results: int,
+    extra_query: str,
+) -> List[Dict[str, Any]]:
+    """
+    Non-streaming version of stream_jobs_with_perplexity (same caching).
+    """
+    return list(
+        stream_jobs_with_perplexity(
+            target_titles=target_titles,
+            locations=locations,
+            must_have_keywords=must_have_keywords,
+            nice_to_have_keywords=nice_to_have_keywords,
+            max_age_hours=max_age_hours,
+            max_results=max_results,
+            extra_query=extra_query,
+        )
+    )
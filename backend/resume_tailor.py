@@ -1,40 +1,88 @@
 import os
-from typing import Dict, Any, Tuple
+import io
+import asyncio
+import functools
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
-from openai import OpenAI
+import orjson
+import pypdf
+import streamlit as st
 
+from .utils import memo_get, memo_put, stable_hash
 
-def _get_client() -> OpenAI:
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
+
+
+# Stop extracting PDF pages once this much text has been collected.
+MAX_CV_CHARS = 12000
+
+# Tailored resumes/emails are reused for this long (they contain personal
+# data, so they are not kept forever).
+TAILOR_CACHE_SECONDS = 7 * 24 * 3600
+
+# Jobs tailored per OpenAI call in bulk mode, and the output tokens budgeted
+# for each one (a ~2000-token resume plus a ~600-token email).
+TAILOR_BATCH_SIZE = 5
+_BATCH_TOKENS_PER_JOB = 2600
+
+
+def _openai_api_key() -> str:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY environment variable is not set.")
-    return OpenAI(api_key=api_key)
+    return api_key
 
 
-def _read_cv_file(uploaded_cv) -> str:
+@functools.lru_cache(maxsize=1)
+def _openai():
     """
-    uploaded_cv is a Streamlit UploadedFile. We support text or PDF.
-    Use getvalue() so it can be read multiple times.
+    Import the openai SDK on first use rather than at app start-up, so just
+    browsing the job feed doesn't pay for it.
     """
-    import io
+    import openai
+
+    return openai
 
-    if uploaded_cv is None:
-        return ""
 
-    name = uploaded_cv.name.lower()
-    raw_bytes = uploaded_cv.getvalue()  # safe multiple reads
+@st.cache_resource(show_spinner=False)
+def _get_client(api_key: str) -> "OpenAI":
+    """
+    One client (and connection pool) per API key for the whole process.
+    Keyed on the key so pasting a new one in the sidebar builds a new client.
+    """
+    return _openai().OpenAI(api_key=api_key)
+
+
+def _get_async_client() -> "AsyncOpenAI":
+    """
+    Async clients are bound to the event loop they are used in, so build a
+    fresh one per asyncio.run() instead of sharing it across reruns.
+    """
+    return _openai().AsyncOpenAI(api_key=_openai_api_key())
 
+
+@st.cache_data(show_spinner=False)
+def _extract_cv_text(raw_bytes: bytes, name: str) -> str:
+    """
+    Cached on the uploaded file's bytes + name, so the same PDF is only
+    parsed once no matter how many jobs are tailored against it.
+    """
     if name.endswith(".txt"):
         return raw_bytes.decode("utf-8", errors="ignore")
 
     if name.endswith(".pdf"):
         try:
-            import PyPDF2
-
-            reader = PyPDF2.PdfReader(io.BytesIO(raw_bytes))
+            reader = pypdf.PdfReader(io.BytesIO(raw_bytes))
             text_parts = []
+            total_chars = 0
             for page in reader.pages:
-                text_parts.append(page.extract_text() or "")
+                page_text = page.extract_text() or ""
+                text_parts.append(page_text)
+                total_chars += len(page_text)
+                # Prompts only need the first few pages; skip the rest.
+                if total_chars > MAX_CV_CHARS:
+                    break
             return "\n".join(text_parts)
         except Exception:
             return ""
@@ -43,18 +91,37 @@ def _read_cv_file(uploaded_cv) -> str:
     return raw_bytes.decode("utf-8", errors="ignore")
 
 
-def generate_tailored_resume_and_email(
+def _read_cv_file(uploaded_cv) -> str:
+    """
+    uploaded_cv is a Streamlit UploadedFile. We support text or PDF.
+    Use getvalue() so it can be read multiple times.
+    """
+    if uploaded_cv is None:
+        return ""
+
+    return _extract_cv_text(uploaded_cv.getvalue(), uploaded_cv.name.lower())
+
+
+def _tailor_key(
     job: Dict[str, Any],
-    uploaded_cv,
-    profile: Dict[str, Any],
-) -> Tuple[str, str]:
+    cv_hash: str,
+    profile_hash: str,
+) -> Tuple[str, ...]:
     """
-    Returns (tailored_resume_markdown, email_body_markdown)
+    Disk-cache key for one tailored (resume, email) pair: the same job,
+    CV and profile don't go to OpenAI twice within TAILOR_CACHE_SECONDS,
+    even across app restarts.
     """
-    client = _get_client()
-    base_cv_text = _read_cv_file(uploaded_cv)
+    return (
+        job.get("url") or "",
+        job.get("title") or "",
+        job.get("company") or "",
+        cv_hash,
+        profile_hash,
+    )
+
 
-    system_prompt = """
+_RESUME_SYSTEM_PROMPT = """
 You are an expert resume writer for STEM students on OPT in the USA.
 
 Your job:
@@ -71,15 +138,34 @@ Rules:
 - You may reword or merge bullets for clarity and impact.
 - Keep the resume to 1–2 pages worth of text.
 - The resume must be valid GitHub-flavored Markdown.
-    """.strip()
+""".strip()
+
+_EMAIL_SYSTEM_PROMPT = """
+You are writing a concise, friendly job application email.
+
+Write a short email / message that:
+- addresses the hiring manager (use a generic greeting if no name),
+- mentions the role and company,
+- highlights 3–5 points from the candidate's profile that match the job,
+- has a clear closing line and call-to-action.
+
+Do NOT mention visa details unless the user explicitly asked you to.
+Return plain text or Markdown, no extra commentary.
+""".strip()
 
+
+def _resume_request(
+    job: Dict[str, Any],
+    cv_text: str,
+    profile: Dict[str, Any],
+) -> Dict[str, Any]:
     user_prompt_resume = f"""
 Candidate profile summary (free text from sidebar):
 {profile.get("profile_summary", "")}
 
 Base resume (raw text):
 \"\"\""
-{base_cv_text}
+{cv_text}
 \"\"\""
 
 Job info:
@@ -93,30 +179,21 @@ Job info:
 Now output ONLY the tailored resume in Markdown, no explanation.
     """.strip()
 
-    resume_resp = client.chat.completions.create(
+    return dict(
         model="gpt-4.1-mini",
         messages=[
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": _RESUME_SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt_resume},
         ],
         temperature=0.4,
         max_tokens=2000,
     )
-    tailored_resume_md = resume_resp.choices[0].message.content
 
-    email_system_prompt = """
-You are writing a concise, friendly job application email.
-
-Write a short email / message that:
-- addresses the hiring manager (use a generic greeting if no name),
-- mentions the role and company,
-- highlights 3–5 points from the candidate's profile that match the job,
-- has a clear closing line and call-to-action.
-
-Do NOT mention visa details unless the user explicitly asked you to.
-Return plain text or Markdown, no extra commentary.
-    """.strip()
 
+def _email_request(
+    job: Dict[str, Any],
+    profile: Dict[str, Any],
+) -> Dict[str, Any]:
     email_user_prompt = f"""
 Candidate profile:
 {profile.get("profile_summary", "")}
@@ -135,15 +212,176 @@ Job info:
 Write the email now.
     """.strip()
 
-    email_resp = client.chat.completions.create(
+    return dict(
         model="gpt-4.1-mini",
         messages=[
-            {"role": "system", "content": email_system_prompt},
+            {"role": "system", "content": _EMAIL_SYSTEM_PROMPT},
             {"role": "user", "content": email_user_prompt},
         ],
         temperature=0.5,
         max_tokens=600,
     )
+
+
+_BATCH_OUTPUT_INSTRUCTIONS = """
+You will receive one base resume and a numbered list of jobs.
+For EVERY job, write:
+- "resume_md": a tailored resume in Markdown, following the rules above.
+- "email": a concise, friendly application email that addresses the hiring
+  manager (generic greeting if no name), mentions the role and company,
+  highlights 3–5 matching points and ends with a clear call-to-action.
+  Do NOT mention visa details.
+
+Reply with a single JSON object of the form:
+{"applications": [{"index": 0, "resume_md": "...", "email": "..."}, ...]}
+with exactly one entry per job, using the job's number as "index".
+""".strip()
+
+
+def _batch_request(
+    jobs: List[Dict[str, Any]],
+    cv_text: str,
+    profile: Dict[str, Any],
+) -> Dict[str, Any]:
+    jobs_text = "\n\n".join(
+        f"""
+Job {i}:
+- Title: {job.get("title", "")}
+- Company: {job.get("company", "")}
+- Location: {job.get("location", "")}
+- Type: {job.get("type", "")}
+- Job summary:
+{job.get("summary", "")}
+        """.strip()
+        for i, job in enumerate(jobs)
+    )
+
+    user_prompt = f"""
+Candidate profile summary (free text from sidebar):
+{profile.get("profile_summary", "")}
+
+Relevant keywords (must-have):
+{profile.get("must_have_keywords", "")}
+
+Base resume (raw text):
+\"\"\""
+{cv_text}
+\"\"\""
+
+{jobs_text}
+    """.strip()
+
+    return dict(
+        model="gpt-4.1-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": _RESUME_SYSTEM_PROMPT + "\n\n" + _BATCH_OUTPUT_INSTRUCTIONS,
+            },
+            {"role": "user", "content": user_prompt},
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.4,
+        max_tokens=_BATCH_TOKENS_PER_JOB * len(jobs),
+    )
+
+
+def generate_tailored_resume_and_email(
+    job: Dict[str, Any],
+    uploaded_cv,
+    profile: Dict[str, Any],
+) -> Tuple[str, str]:
+    """
+    Returns (tailored_resume_markdown, email_body_markdown)
+    """
+    base_cv_text = _read_cv_file(uploaded_cv)
+    cache_key = _tailor_key(job, stable_hash(base_cv_text), stable_hash(profile))
+    cached = memo_get("tailored", cache_key, TAILOR_CACHE_SECONDS)
+    if cached is not None:
+        return tuple(cached)
+
+    client = _get_client(_openai_api_key())
+
+    resume_resp = client.chat.completions.create(
+        **_resume_request(job, base_cv_text, profile)
+    )
+    tailored_resume_md = resume_resp.choices[0].message.content
+
+    email_resp = client.chat.completions.create(**_email_request(job, profile))
     email_body = email_resp.choices[0].message.content
 
+    memo_put(
+        "tailored", cache_key, (tailored_resume_md, email_body), TAILOR_CACHE_SECONDS
+    )
     return tailored_resume_md, email_body
+
+
+async def generate_tailored_resume_and_email_async(
+    job: Dict[str, Any],
+    cv_text: str,
+    profile: Dict[str, Any],
+    client: "AsyncOpenAI",
+    sem: asyncio.Semaphore,
+) -> Tuple[str, str]:
+    """
+    Async variant used for bulk preparation. Takes the already-extracted CV
+    text and a shared client; `sem` bounds how many jobs are in flight.
+    The resume and email calls for one job run concurrently.
+    """
+    async with sem:
+        resume_resp, email_resp = await asyncio.gather(
+            client.chat.completions.create(**_resume_request(job, cv_text, profile)),
+            client.chat.completions.create(**_email_request(job, profile)),
+        )
+
+    return (
+        resume_resp.choices[0].message.content,
+        email_resp.choices[0].message.content,
+    )
+
+
+async def generate_tailored_batch_async(
+    jobs: List[Dict[str, Any]],
+    cv_text: str,
+    profile: Dict[str, Any],
+    client: "AsyncOpenAI",
+    sem: asyncio.Semaphore,
+) -> List[Optional[Tuple[str, str]]]:
+    """
+    Tailors several jobs (up to TAILOR_BATCH_SIZE) in a single JSON-mode call,
+    so the system prompt and CV are sent once per batch instead of twice
+    per job. Returns (tailored_resume_markdown, email_body_markdown) in the
+    order of `jobs`; any job the model skipped or mangled is retried on its
+    own with generate_tailored_resume_and_email_async, and is None if that
+    retry fails too. Errors from the batch call itself are raised.
+    """
+    async with sem:
+        resp = await client.chat.completions.create(
+            **_batch_request(jobs, cv_text, profile)
+        )
+
+    by_index: Dict[int, Tuple[str, str]] = {}
+    try:
+        items = orjson.loads(resp.choices[0].message.content)["applications"]
+        for item in items:
+            resume_md, email = item.get("resume_md"), item.get("email")
+            if isinstance(resume_md, str) and isinstance(email, str):
+                by_index[int(item["index"])] = (resume_md, email)
+    except Exception:
+        pass
+
+    missing = [i for i in range(len(jobs)) if i not in by_index]
+    retried = await asyncio.gather(
+        *[
+            generate_tailored_resume_and_email_async(
+                jobs[i], cv_text, profile, client, sem
+            )
+            for i in missing
+        ],
+        return_exceptions=True,
+    )
+    for i, result in zip(missing, retried):
+        if not isinstance(result, BaseException):
+            by_index[i] = result
+
+    return [by_index.get(i) for i in range(len(jobs))]
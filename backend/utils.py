@@ -1,2 +1,113 @@
+# Small helpers shared by the app and backend (parsing, deduplication, etc.)
+import os
+import time
+import hashlib
+import tempfile
+from typing import List, Dict, Any, Optional, Tuple
 
-# Placeholder for future utilities (parsing, deduplication, etc.)
+import orjson
+
+# Where memo_get / memo_put keep their entries (one JSON file per entry).
+MEMO_DIR = os.getenv("AUTOAPPLY_CACHE_DIR", os.path.join(".cache", "autoapply"))
+
+
+def dedupe_jobs(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drop repeated postings, keeping the first occurrence (so call it after
+    sorting). Two jobs are the same if their URLs match once the query string
+    is removed, or if they share company + title (the same posting reposted
+    on different aggregators).
+    """
+    seen_urls = set()
+    seen_roles = set()
+    unique = []
+    for job in jobs:
+        url = (job.get("url") or "").split("?")[0].rstrip("/").lower()
+        role = (
+            (job.get("company") or "").strip().lower(),
+            (job.get("title") or "").strip().lower(),
+        )
+        if (url and url in seen_urls) or (all(role) and role in seen_roles):
+            continue
+        if url:
+            seen_urls.add(url)
+        if all(role):
+            seen_roles.add(role)
+        unique.append(job)
+    return unique
+
+
+def stable_hash(obj: Any) -> str:
+    """
+    Short content hash that is stable across restarts (unlike hash()),
+    for use in cache keys. Dict keys are sorted so ordering doesn't matter.
+    """
+    if isinstance(obj, str):
+        data = obj.encode("utf-8")
+    else:
+        data = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+_last_prune: Dict[str, float] = {}
+
+
+def _memo_path(namespace: str, key: Tuple) -> str:
+    return os.path.join(MEMO_DIR, namespace, stable_hash(list(key)) + ".json")
+
+
+def _prune_memo(namespace: str, max_age: float) -> None:
+    # Called on every memo_put; only walk the directory once a minute.
+    now = time.time()
+    if now - _last_prune.get(namespace, 0.0) < 60:
+        return
+    _last_prune[namespace] = now
+
+    cutoff = now - max_age
+    try:
+        with os.scandir(os.path.join(MEMO_DIR, namespace)) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+    except OSError:
+        pass
+
+
+def memo_get(namespace: str, key: Tuple, max_age: float) -> Optional[Any]:
+    """
+    Look up a value stored with memo_put. Entries live on disk, so they
+    survive app restarts; anything older than `max_age` seconds counts as a
+    miss and is deleted. Returns None on a miss.
+    """
+    path = _memo_path(namespace, key)
+    try:
+        with open(path, "rb") as f:
+            entry = orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - entry["ts"] > max_age:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return entry["value"]
+
+
+def memo_put(namespace: str, key: Tuple, value: Any, max_age: float) -> None:
+    """
+    Store a JSON-serializable value (tuples come back as lists). Entries of
+    the namespace older than `max_age` are pruned on the way, so the cache
+    directory doesn't grow without bound. Failing to write is not an error.
+    """
+    path = _memo_path(namespace, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _prune_memo(namespace, max_age)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps({"ts": time.time(), "value": value}))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass